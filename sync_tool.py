@@ -5,13 +5,20 @@ Chat Topic Synchronization Tool
 Synchronizes chat topics between Frontend A and Frontend B
 """
 
+import bisect
 import json
+import mmap
 import os
-import re
-import shutil
-from pathlib import Path
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import random
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # ========== CONFIGURATION ==========
 FRONTEND_A_PATH = r"你的VCPChat路径\VCPChat"
@@ -19,18 +26,94 @@ FRONTEND_B_PATH = r"你的Obsidian仓库路径\这是你仓库的名字"
 AGENT_MAPPING_FILE = r"你的agent_mapping.json路径\agent_mapping.json" # OChat的Agent的ID对VChat的Agent的ID的映射
 
 # Topic naming pattern: topic_{timestamp}
-TOPIC_PATTERN = re.compile(r'^topic_(\d+)$')
+TOPIC_PREFIX = 'topic_'
+
+# Frontend B keeps topics in both of these agent subdirectories
+B_TOPIC_SUBDIRS = ('topics', '.saved_chats')
+
+# Sidecar file (next to the agent mapping) recording each agent pair's state after its last sync
+SYNC_STATE_FILENAME = ".sync-state.json"
+
+# Characters used for the random suffix of generated message IDs
+MESSAGE_ID_ALPHABET = string.ascii_lowercase + string.digits
+
+# Dedicated generator for message IDs (avoids the shared module-level instance lookup)
+_id_rng = random.Random()
+
+# Max number of history.json files each scanner reads concurrently (caps open file descriptors)
+MAX_LOAD_WORKERS = 16
+
+# History files with more messages than this are written compact (no indentation)
+PRETTY_HISTORY_MAX_MESSAGES = 200
+
+# history.json files at least this large are parsed from a memory map
+MMAP_MIN_SIZE = 64 * 1024
 
 # ========== UTILITY FUNCTIONS ==========
 
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON from raw bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any, indent: bool = True) -> bytes:
+    """Serialize to UTF-8 JSON bytes ending in a newline, using orjson when available.
+    
+    Args:
+        obj: Object to serialize
+        indent: Indent with 2 spaces; otherwise write compact JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if indent:
+        text = json.dumps(obj, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    return (text + '\n').encode('utf-8')
+
+
+def _write_json_atomic(path: str, obj: Any, indent: bool = True):
+    """Serialize obj and atomically replace path with it.
+    
+    The data is written to a sibling .tmp file in a single write and then
+    moved over the target with os.replace, so readers never see a partial file.
+    """
+    buf = _json_dumps(obj, indent)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(buf)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 def load_agent_mapping(filepath: str) -> Dict[str, Dict[str, str]]:
     """Load agent mapping from JSON file.
     
     Returns:
         Dict with B agent IDs as keys, containing 'a_id' and 'name'
     """
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(filepath, 'rb') as f:
+        return _json_loads(f.read())
+
+
+def _parse_topic_ts(topic_id: str) -> Optional[int]:
+    """Return the timestamp of a topic_{timestamp} ID, or None if it doesn't match."""
+    if topic_id.startswith(TOPIC_PREFIX):
+        suffix = topic_id[len(TOPIC_PREFIX):]
+        if suffix.isdecimal():
+            return int(suffix)
+    return None
 
 
 def is_valid_topic_id(topic_id: str, data: Optional[Dict] = None) -> bool:
@@ -43,7 +126,7 @@ def is_valid_topic_id(topic_id: str, data: Optional[Dict] = None) -> bool:
     Returns:
         True if valid topic
     """
-    if TOPIC_PATTERN.match(topic_id):
+    if _parse_topic_ts(topic_id) is not None:
         return True
     
     # Also check if the data contains createdAt timestamp
@@ -55,77 +138,152 @@ def is_valid_topic_id(topic_id: str, data: Optional[Dict] = None) -> bool:
 
 def generate_message_id(timestamp: int, role: str) -> str:
     """Generate a unique message ID."""
-    import random
-    import string
-    random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=7))
+    random_suffix = ''.join(_id_rng.choices(MESSAGE_ID_ALPHABET, k=7))
     return f"msg_{timestamp}_{role}_{random_suffix}"
 
 
 # ========== SCANNER FUNCTIONS ==========
 
+def _iter_topic_histories(topics_dir: str) -> Iterator[Tuple[str, str]]:
+    """Yield (topic_id, history_file) for each topic directory in topics_dir.
+    
+    history.json is not checked for existence; loading a missing one raises
+    FileNotFoundError, which load_topic_histories skips. A missing topics_dir
+    yields nothing.
+    """
+    try:
+        it = os.scandir(topics_dir)
+    except FileNotFoundError:
+        return
+    
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield entry.name, os.path.join(entry.path, "history.json")
+
+
+def _load_topic(path: str) -> Any:
+    """Load a single topic history.json file.
+    
+    With orjson, large files are parsed straight from a read-only memory map
+    instead of being copied into a bytes object first.
+    """
+    with open(path, 'rb') as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+        return _json_loads(f.read())
+
+
+def load_topic_histories(pending: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Load history.json files concurrently.
+    
+    Args:
+        pending: List of (topic_id, history_file) pairs to load
+    
+    Returns:
+        Dict[history_file, topic_data] for every file that loaded successfully
+    """
+    loaded = {}
+    if not pending:
+        return loaded
+    
+    with ThreadPoolExecutor(max_workers=min(MAX_LOAD_WORKERS, len(pending))) as executor:
+        futures = {
+            executor.submit(_load_topic, history_file): (topic_id, history_file)
+            for topic_id, history_file in pending
+        }
+        for future in as_completed(futures):
+            topic_id, history_file = futures[future]
+            try:
+                loaded[history_file] = future.result()
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"Error loading topic {topic_id}: {e}")
+    
+    return loaded
+
+
 def scan_frontend_a(base_path: str, agent_mapping: Dict) -> Dict[str, Dict]:
     """Scan Frontend A for all agents and topics.
     
     Returns:
-        Dict[agent_id, {'config_path': str, 'topics': Dict[topic_id, topic_data]}]
+        Dict[agent_id, {'config_path': str, 'topics': Dict[topic_id, topic_data],
+                        'invalid_topic_ids': List[topic_id]}]
+        Topics whose ID doesn't match topic_{timestamp} are never loaded; their
+        IDs are listed in 'invalid_topic_ids' instead.
     """
     result = {}
-    agents_dir = Path(base_path) / "APPData" / "Agents"
+    agents_dir = os.path.join(base_path, "APPData", "Agents")
+    user_data_dir = os.path.join(base_path, "APPData", "UserData")
     
-    if not agents_dir.exists():
+    if not os.path.exists(agents_dir):
         print(f"Warning: Agents directory not found: {agents_dir}")
         return result
     
     # Get all agent IDs that are in the mapping (as values)
     valid_a_ids = {mapping['a_id'] for mapping in agent_mapping.values()}
     
-    for agent_dir in agents_dir.iterdir():
-        if not agent_dir.is_dir():
-            continue
-        
-        agent_id = agent_dir.name
-        
-        # Only process agents that are in the mapping
-        if agent_id not in valid_a_ids:
-            continue
-        
-        config_path = agent_dir / "config.json"
-        if not config_path.exists():
-            print(f"Warning: config.json not found for agent {agent_id}")
-            continue
-        
-        # Load topics from UserData
-        user_topics_dir = Path(base_path) / "APPData" / "UserData" / agent_id / "topics"
-        topics = {}
-        
-        if user_topics_dir.exists():
-            for topic_dir in user_topics_dir.iterdir():
-                if not topic_dir.is_dir():
-                    continue
-                
-                topic_id = topic_dir.name
-                history_file = topic_dir / "history.json"
-                
-                if not history_file.exists():
+    # Enumerate topic directories first, then load all histories in parallel
+    pending_by_agent = {}
+    
+    with os.scandir(agents_dir) as it:
+        for entry in it:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            
+            agent_id = entry.name
+            
+            # Only process agents that are in the mapping
+            if agent_id not in valid_a_ids:
+                continue
+            
+            config_path = os.path.join(entry.path, "config.json")
+            if not os.path.exists(config_path):
+                print(f"Warning: config.json not found for agent {agent_id}")
+                continue
+            
+            # Collect topics from UserData
+            user_topics_dir = os.path.join(user_data_dir, agent_id, "topics")
+            pending = []
+            invalid_topic_ids = []
+            
+            for topic_id, history_file in _iter_topic_histories(user_topics_dir):
+                # Only topic_{timestamp} topics can be synced; skip loading the rest
+                topic_ts = _parse_topic_ts(topic_id)
+                if topic_ts is None:
+                    invalid_topic_ids.append(topic_id)
                     continue
                 
-                # Load history data
-                try:
-                    with open(history_file, 'r', encoding='utf-8') as f:
-                        topic_data = json.load(f)
-                    
-                    # Validate topic
-                    if is_valid_topic_id(topic_id, {'createdAt': True}):  # A's topics are in messages
-                        topics[topic_id] = {
-                            'data': topic_data,
-                            'path': history_file
-                        }
-                except Exception as e:
-                    print(f"Error loading topic {topic_id}: {e}")
+                pending.append((topic_id, history_file, topic_ts))
+            
+            pending_by_agent[agent_id] = (config_path, pending, invalid_topic_ids)
+    
+    loaded = load_topic_histories([
+        (topic_id, history_file)
+        for _, pending, _ in pending_by_agent.values()
+        for topic_id, history_file, _ in pending
+    ])
+    
+    for agent_id, (config_path, pending, invalid_topic_ids) in pending_by_agent.items():
+        topics = {}
+        
+        for topic_id, history_file, topic_ts in pending:
+            if history_file not in loaded:
+                continue
+            
+            topics[topic_id] = {
+                'data': loaded[history_file],
+                'path': history_file,
+                'ts': topic_ts
+            }
         
         result[agent_id] = {
-            'config_path': str(config_path),
-            'topics': topics
+            'config_path': config_path,
+            'topics': topics,
+            'invalid_topic_ids': invalid_topic_ids
         }
     
     return result
@@ -135,81 +293,83 @@ def scan_frontend_b(base_path: str, agent_mapping: Dict) -> Dict[str, Dict]:
     """Scan Frontend B for all agents and topics (including hidden directories).
     
     Returns:
-        Dict[agent_id, {'topics': Dict[topic_id, topic_data]}]
+        Dict[agent_id, {'topics': Dict[topic_id, topic_data], 'invalid_topic_ids': List[topic_id]}]
     """
     result = {}
-    chats_dir = Path(base_path) / ".OChat-chats"
+    chats_dir = os.path.join(base_path, ".OChat-chats")
     
-    if not chats_dir.exists():
+    if not os.path.exists(chats_dir):
         print(f"Warning: .OChat-chats directory not found: {chats_dir}")
         return result
     
     # Only process agents that are in the mapping
     valid_b_ids = list(agent_mapping.keys())
     
-    for agent_dir in chats_dir.iterdir():
-        if not agent_dir.is_dir():
-            continue
-        
-        # Extract agent ID from directory name (format: _Agent_{id}_{id})
-        dir_name = agent_dir.name
-        if not dir_name.startswith("_Agent_"):
-            continue
-        
-        # Extract the first ID
-        parts = dir_name.split('_')
-        if len(parts) >= 3:
-            agent_id = parts[2]
-        else:
-            continue
-        
-        # Only process agents in mapping
-        if agent_id not in valid_b_ids:
-            continue
-        
-        topics = {}
-        
-        # Scan both 'topics' and '.saved_chats' directories
-        for subdir_name in ['topics', '.saved_chats']:
-            topics_dir = agent_dir / subdir_name
+    # Enumerate topic directories first, then load all histories in parallel
+    pending_by_agent = {}
+    
+    with os.scandir(chats_dir) as it:
+        for entry in it:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
             
-            if not topics_dir.exists():
+            # Extract agent ID from directory name (format: _Agent_{id}_{id})
+            dir_name = entry.name
+            if not dir_name.startswith("_Agent_"):
                 continue
             
-            for topic_dir in topics_dir.iterdir():
-                if not topic_dir.is_dir():
-                    continue
-                
-                topic_id = topic_dir.name
-                history_file = topic_dir / "history.json"
-                
-                if not history_file.exists():
-                    continue
+            # Extract the first ID
+            parts = dir_name.split('_')
+            if len(parts) >= 3:
+                agent_id = parts[2]
+            else:
+                continue
+            
+            # Only process agents in mapping
+            if agent_id not in valid_b_ids:
+                continue
+            
+            pending = []
+            
+            # Scan both 'topics' and '.saved_chats' directories
+            for subdir_name in B_TOPIC_SUBDIRS:
+                topics_dir = os.path.join(entry.path, subdir_name)
                 
-                # Load history data
-                try:
-                    with open(history_file, 'r', encoding='utf-8') as f:
-                        topic_data = json.load(f)
-                    
-                    # Validate topic
-                    if is_valid_topic_id(topic_id, topic_data):
-                        # Extract just the ID from topic_1234567890 format
-                        id_match = TOPIC_PATTERN.match(topic_id)
-                        if id_match:
-                            timestamp_id = id_match.group(1)
-                        else:
-                            timestamp_id = topic_data.get('id', topic_id)
-                        
-                        topics[topic_id] = {
-                            'data': topic_data,
-                            'path': history_file,
-                            'source_dir': subdir_name
-                        }
-                except Exception as e:
-                    print(f"Error loading topic {topic_id}: {e}")
+                for topic_id, history_file in _iter_topic_histories(topics_dir):
+                    pending.append((topic_id, history_file, subdir_name))
+            
+            pending_by_agent[agent_id] = pending
+    
+    loaded = load_topic_histories([
+        (topic_id, history_file)
+        for pending in pending_by_agent.values()
+        for topic_id, history_file, _ in pending
+    ])
+    
+    for agent_id, pending in pending_by_agent.items():
+        topics = {}
+        invalid_topic_ids = []
+        
+        for topic_id, history_file, subdir_name in pending:
+            if history_file not in loaded:
+                continue
+            
+            topic_data = loaded[history_file]
+            
+            # Validate topic
+            if is_valid_topic_id(topic_id, topic_data):
+                topics[topic_id] = {
+                    'data': topic_data,
+                    'path': history_file,
+                    'source_dir': subdir_name,
+                    'ts': _parse_topic_ts(topic_id)
+                }
+            else:
+                invalid_topic_ids.append(topic_id)
         
         result[agent_id] = {
-            'topics': topics
+            'topics': topics,
+            'invalid_topic_ids': invalid_topic_ids
         }
     
     return result
@@ -217,11 +377,11 @@ def scan_frontend_b(base_path: str, agent_mapping: Dict) -> Dict[str, Dict]:
 
 # ========== CONVERSION FUNCTIONS ==========
 
-def convert_a_to_b(topic_data: List[Dict], topic_id: str, agent_b_id: str, title: Optional[str] = None) -> Dict:
+def convert_a_to_b(topic_data: Iterable[Dict], topic_id: str, agent_b_id: str, title: Optional[str] = None) -> Dict:
     """Convert Frontend A format to Frontend B format.
     
     Args:
-        topic_data: Array of messages from Frontend A
+        topic_data: Messages from Frontend A (any iterable, consumed once)
         topic_id: The topic ID (should be topic_{timestamp})
         agent_b_id: Agent ID for Frontend B
         title: Optional title, will be generated if not provided
@@ -230,39 +390,38 @@ def convert_a_to_b(topic_data: List[Dict], topic_id: str, agent_b_id: str, title
         Dict in Frontend B format
     """
     # Extract timestamp from topic_id
-    match = TOPIC_PATTERN.match(topic_id)
-    if match:
-        timestamp = int(match.group(1))
-    else:
-        timestamp = int(datetime.now().timestamp() * 1000)
+    timestamp = _parse_topic_ts(topic_id)
+    if timestamp is None:
+        timestamp = time.time_ns() // 1_000_000
     
-    # Generate title if not provided
-    if not title:
-        # Try to get from first user message
-        for msg in topic_data:
-            if msg.get('role') == 'user':
-                content = msg.get('content', '')
-                title = content[:20] if content else f"新话题 {timestamp}"
-                break
-        if not title:
-            title = f"新话题 {timestamp}"
-    
-    # Convert messages: strip Frontend A specific fields
+    # Single pass: strip Frontend A specific fields, track the latest
+    # timestamp for updatedAt and, only when no title was given, the
+    # first user message for the generated title
     converted_messages = []
-    for msg in topic_data:
-        converted_msg = {
-            'role': msg.get('role'),
-            'content': msg.get('content', '')
-        }
-        converted_messages.append(converted_msg)
-    
-    # Get latest timestamp for updatedAt
     updated_at = timestamp
+    first_user_content = None
+    need_title = not title
+    
     for msg in topic_data:
+        role = msg.get('role')
+        content = msg.get('content', '')
+        converted_messages.append({
+            'role': role,
+            'content': content
+        })
+        
+        if need_title and role == 'user':
+            need_title = False
+            first_user_content = content
+        
         msg_ts = msg.get('timestamp', 0)
         if msg_ts > updated_at:
             updated_at = msg_ts
     
+    # Generate title if not provided
+    if not title:
+        title = first_user_content[:20] if first_user_content else f"新话题 {timestamp}"
+    
     return {
         'id': str(timestamp),
         'agentId': agent_b_id,
@@ -277,7 +436,7 @@ def convert_b_to_a(topic_data: Dict, topic_id: str, agent_a_id: str) -> List[Dic
     """Convert Frontend B format to Frontend A format.
     
     Args:
-        topic_data: Frontend B topic data object
+        topic_data: Frontend B topic data object ('messages' may be any iterable)
         topic_id: The topic ID
         agent_a_id: Agent ID for Frontend A
     
@@ -287,11 +446,20 @@ def convert_b_to_a(topic_data: Dict, topic_id: str, agent_a_id: str) -> List[Dic
     messages = topic_data.get('messages', [])
     
     # Generate base timestamp from topic creation
-    match = TOPIC_PATTERN.match(topic_id)
-    if match:
-        base_timestamp = int(match.group(1))
-    else:
-        base_timestamp = topic_data.get('updatedAt', int(datetime.now().timestamp() * 1000))
+    base_timestamp = _parse_topic_ts(topic_id)
+    if base_timestamp is None:
+        base_timestamp = topic_data.get('updatedAt', time.time_ns() // 1_000_000)
+    
+    # Per-topic constants, built once instead of for every message
+    assistant_name = topic_data.get('title', 'Agent')
+    assistant_extra = {
+        'isThinking': False,
+        'avatarUrl': f'file://D:\\\\路径\\\\VCPChat\\\\AppData\\\\Agents\\\\{agent_a_id}\\\\avatar.png',
+        'avatarColor': 'rgb(207, 191, 177)',
+        'isGroupMessage': False,
+        'agentId': agent_a_id,
+        'finishReason': 'completed'
+    }
     
     converted_messages = []
     
@@ -304,7 +472,7 @@ def convert_b_to_a(topic_data: Dict, topic_id: str, agent_a_id: str) -> List[Dic
         
         converted_msg = {
             'role': role,
-            'name': 'Zeta' if role == 'user' else topic_data.get('title', 'Agent'),
+            'name': 'Zeta' if role == 'user' else assistant_name,
             'content': msg.get('content', ''),
             'timestamp': current_timestamp,
             'id': generate_message_id(current_timestamp, role),
@@ -313,14 +481,7 @@ def convert_b_to_a(topic_data: Dict, topic_id: str, agent_a_id: str) -> List[Dic
         
         # Add assistant-specific fields
         if role == 'assistant':
-            converted_msg.update({
-                'isThinking': False,
-                'avatarUrl': f'file://D:\\\\路径\\\\VCPChat\\\\AppData\\\\Agents\\\\{agent_a_id}\\\\avatar.png',
-                'avatarColor': 'rgb(207, 191, 177)',
-                'isGroupMessage': False,
-                'agentId': agent_a_id,
-                'finishReason': 'completed'
-            })
+            converted_msg.update(assistant_extra)
         
         converted_messages.append(converted_msg)
         current_timestamp += time_increment
@@ -330,62 +491,86 @@ def convert_b_to_a(topic_data: Dict, topic_id: str, agent_a_id: str) -> List[Dic
 
 # ========== SYNC FUNCTIONS ==========
 
-def update_frontend_a_config(config_path: str, topic_id: str, topic_title: str, created_at: int):
-    """Update Frontend A's config.json to include a new topic.
+def update_frontend_a_config_batch(config_path: str, new_entries: List[Dict]):
+    """Update Frontend A's config.json to include new topics.
+    
+    The file is read and written once for the whole batch.
     
     Args:
         config_path: Path to config.json
-        topic_id: ID of the new topic
-        topic_title: Title of the topic
-        created_at: Creation timestamp
+        new_entries: Topics to add, each with 'id', 'name' and 'createdAt'
     """
+    if not new_entries:
+        return
+    
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        with open(config_path, 'rb') as f:
+            config = _json_loads(f.read())
         
-        # Check if topic already exists
         existing_topics = config.get('topics', [])
-        for topic in existing_topics:
-            if topic.get('id') == topic_id:
-                print(f"  Topic {topic_id} already in config.json")
-                return
+        existing_ids = {topic.get('id') for topic in existing_topics}
+        added_count = 0
         
-        # Add new topic
-        new_topic_entry = {
-            'id': topic_id,
-            'name': topic_title,
-            'createdAt': created_at,
-            'locked': True,
-            'unread': False,
-            'creatorSource': 'sync'
-        }
+        # Negated createdAt keys, ascending when topics are newest first.
+        # Binary search only applies while the list is actually sorted;
+        # hand-reordered configs fall back to the linear scan.
+        sort_keys = [-topic.get('createdAt', 0) for topic in existing_topics]
+        is_sorted = all(sort_keys[i] <= sort_keys[i + 1] for i in range(len(sort_keys) - 1))
         
-        # Insert at the correct position based on createdAt timestamp
-        # Topics should be sorted by createdAt in descending order (newest first)
-        insert_position = len(existing_topics)  # Default: append to end
+        for entry in new_entries:
+            topic_id = entry['id']
+            created_at = entry['createdAt']
+            
+            # Check if topic already exists
+            if topic_id in existing_ids:
+                print(f"  Topic {topic_id} already in config.json")
+                continue
+            
+            new_topic_entry = {
+                'id': topic_id,
+                'name': entry['name'],
+                'createdAt': created_at,
+                'locked': True,
+                'unread': False,
+                'creatorSource': 'sync'
+            }
+            
+            # Insert at the correct position based on createdAt timestamp
+            # Topics should be sorted by createdAt in descending order (newest first)
+            if is_sorted:
+                # First topic older than this one
+                insert_position = bisect.bisect_right(sort_keys, -created_at)
+            else:
+                insert_position = len(existing_topics)  # Default: append to end
+                
+                for i, topic in enumerate(existing_topics):
+                    topic_created_at = topic.get('createdAt', 0)
+                    if created_at > topic_created_at:
+                        insert_position = i
+                        break
+            
+            existing_topics.insert(insert_position, new_topic_entry)
+            sort_keys.insert(insert_position, -created_at)
+            existing_ids.add(topic_id)
+            added_count += 1
+            
+            # Log the insertion position for debugging
+            if insert_position == 0:
+                print(f"  → {topic_id} inserted at top (newest topic)")
+            elif insert_position == len(existing_topics) - 1:
+                print(f"  → {topic_id} inserted at bottom (oldest topic)")
+            else:
+                print(f"  → {topic_id} inserted at position {insert_position}")
         
-        for i, topic in enumerate(existing_topics):
-            topic_created_at = topic.get('createdAt', 0)
-            if created_at > topic_created_at:
-                insert_position = i
-                break
+        if not added_count:
+            return
         
-        existing_topics.insert(insert_position, new_topic_entry)
         config['topics'] = existing_topics
         
-        # Log the insertion position for debugging
-        if insert_position == 0:
-            print(f"  → Inserted at top (newest topic)")
-        elif insert_position == len(existing_topics) - 1:
-            print(f"  → Inserted at bottom (oldest topic)")
-        else:
-            print(f"  → Inserted at position {insert_position}")
-        
         # Write back
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        _write_json_atomic(config_path, config)
         
-        print(f"  ✓ Updated config.json with topic {topic_id}")
+        print(f"  ✓ Updated config.json with {added_count} topics")
     
     except Exception as e:
         print(f"  ✗ Error updating config.json: {e}")
@@ -402,20 +587,24 @@ def sync_agents(agent_a_id: str, agent_b_id: str, data_a: Dict, data_b: Dict):
     """
     topics_a = data_a.get('topics', {})
     topics_b = data_b.get('topics', {})
+    invalid_ids_a = data_a.get('invalid_topic_ids', [])
     
     print(f"\n{'='*60}")
     print(f"Syncing: {agent_a_id} (A) <-> {agent_b_id} (B)")
     print(f"  Topics in A: {len(topics_a)}")
     print(f"  Topics in B: {len(topics_b)}")
+    if invalid_ids_a:
+        print(f"  Skipped in A (invalid format): {len(invalid_ids_a)}")
     
     # Get topic IDs
     ids_a = set(topics_a.keys())
     ids_b = set(topics_b.keys())
     
     # A has, B doesn't -> sync A to B
-    only_in_a = ids_a - ids_b
+    only_in_a = sorted(ids_a - ids_b)
     # B has, A doesn't -> sync B to A
-    only_in_b = ids_b - ids_a
+    # (invalid A topics still exist on disk and must not be overwritten)
+    only_in_b = sorted(ids_b - ids_a - set(invalid_ids_a))
     
     print(f"  Only in A: {len(only_in_a)}")
     print(f"  Only in B: {len(only_in_b)}")
@@ -425,57 +614,53 @@ def sync_agents(agent_a_id: str, agent_b_id: str, data_a: Dict, data_b: Dict):
         print(f"\n  Syncing A -> B ({len(only_in_a)} topics):")
         
         synced_count = 0
-        skipped_count = 0
+        
+        # Read topic titles from config once for the whole batch
+        title_by_id = {}
+        try:
+            with open(data_a['config_path'], 'rb') as f:
+                config = _json_loads(f.read())
+            for t in config.get('topics', []):
+                title_by_id.setdefault(t.get('id'), t.get('name', '新话题'))
+        except:
+            title_by_id = {}
+        
+        b_topics_dir = os.path.join(FRONTEND_B_PATH, ".OChat-chats", f"_Agent_{agent_b_id}_{agent_b_id}", "topics")
+        os.makedirs(b_topics_dir, exist_ok=True)
         
         for topic_id in only_in_a:
-            # Skip topics that don't match topic_{timestamp} pattern
-            if not TOPIC_PATTERN.match(topic_id):
-                print(f"    ⊘ {topic_id} (skipped - invalid format)")
-                skipped_count += 1
-                continue
-            
             topic_info = topics_a[topic_id]
             topic_data = topic_info['data']
             
             # Get title from config
-            config_path = data_a['config_path']
-            try:
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                title = None
-                for t in config.get('topics', []):
-                    if t.get('id') == topic_id:
-                        title = t.get('name', '新话题')
-                        break
-            except:
-                title = None
+            title = title_by_id.get(topic_id)
             
             # Convert
             converted = convert_a_to_b(topic_data, topic_id, agent_b_id, title)
             
             # Write to B
-            b_agent_dir = Path(FRONTEND_B_PATH) / ".OChat-chats" / f"_Agent_{agent_b_id}_{agent_b_id}"
-            b_topics_dir = b_agent_dir / "topics"
-            b_topics_dir.mkdir(parents=True, exist_ok=True)
-            
-            topic_dir = b_topics_dir / topic_id
-            topic_dir.mkdir(exist_ok=True)
+            topic_dir = os.path.join(b_topics_dir, topic_id)
+            try:
+                os.mkdir(topic_dir)
+            except FileExistsError:
+                pass
             
-            history_file = topic_dir / "history.json"
+            history_file = os.path.join(topic_dir, "history.json")
             
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(converted, f, ensure_ascii=False, indent=2)
+            _write_json_atomic(history_file, converted,
+                               indent=len(converted['messages']) <= PRETTY_HISTORY_MAX_MESSAGES)
             
             print(f"    ✓ {topic_id} -> B")
             synced_count += 1
-        
-        if skipped_count > 0:
-            print(f"    (Skipped {skipped_count} topics with invalid format)")
     
     # Sync B -> A
     if only_in_b:
         print(f"\n  Syncing B -> A ({len(only_in_b)} topics):")
         
+        new_config_entries = []
+        a_user_dir = os.path.join(FRONTEND_A_PATH, "APPData", "UserData", agent_a_id, "topics")
+        os.makedirs(a_user_dir, exist_ok=True)
+        
         for topic_id in only_in_b:
             topic_info = topics_b[topic_id]
             topic_data = topic_info['data']
@@ -484,25 +669,110 @@ def sync_agents(agent_a_id: str, agent_b_id: str, data_a: Dict, data_b: Dict):
             converted = convert_b_to_a(topic_data, topic_id, agent_a_id)
             
             # Write to A
-            a_user_dir = Path(FRONTEND_A_PATH) / "APPData" / "UserData" / agent_a_id / "topics"
-            a_user_dir.mkdir(parents=True, exist_ok=True)
-            
-            topic_dir = a_user_dir / topic_id
-            topic_dir.mkdir(exist_ok=True)
+            topic_dir = os.path.join(a_user_dir, topic_id)
+            try:
+                os.mkdir(topic_dir)
+            except FileExistsError:
+                pass
             
-            history_file = topic_dir / "history.json"
+            history_file = os.path.join(topic_dir, "history.json")
             
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(converted, f, ensure_ascii=False, indent=2)
+            _write_json_atomic(history_file, converted,
+                               indent=len(converted) <= PRETTY_HISTORY_MAX_MESSAGES)
             
             print(f"    ✓ {topic_id} -> A")
             
-            # Update config.json
-            match = TOPIC_PATTERN.match(topic_id)
-            created_at = int(match.group(1)) if match else topic_data.get('updatedAt', 0)
-            title = topic_data.get('title', '新话题')
-            
-            update_frontend_a_config(data_a['config_path'], topic_id, title, created_at)
+            # Queue config.json entry
+            created_at = topic_info['ts']
+            if created_at is None:
+                created_at = topic_data.get('updatedAt', 0)
+            new_config_entries.append({
+                'id': topic_id,
+                'name': topic_data.get('title', '新话题'),
+                'createdAt': created_at
+            })
+        
+        # Update config.json once for all synced topics
+        update_frontend_a_config_batch(data_a['config_path'], new_config_entries)
+
+
+# ========== SYNC STATE ==========
+
+def _snapshot_topics_dir(path: str) -> Tuple[Optional[int], List[str]]:
+    """Return (st_mtime_ns, topic directory names) for a topics directory.
+    
+    A missing directory yields (None, []).
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        with os.scandir(path) as it:
+            names = [entry.name for entry in it if entry.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return None, []
+    return mtime, names
+
+
+def get_agent_pair_state(agent_a_id: str, agent_b_id: str) -> Dict:
+    """Snapshot the topic directories of an agent pair without loading any history.
+    
+    Returns:
+        Dict with 'a_id', 'a_mtime', 'b_mtimes', 'topic_ids_a' and 'topic_ids_b'
+    """
+    a_topics_dir = os.path.join(FRONTEND_A_PATH, "APPData", "UserData", agent_a_id, "topics")
+    a_mtime, topic_ids_a = _snapshot_topics_dir(a_topics_dir)
+    
+    b_agent_dir = os.path.join(FRONTEND_B_PATH, ".OChat-chats", f"_Agent_{agent_b_id}_{agent_b_id}")
+    b_mtimes = []
+    topic_ids_b = set()
+    for subdir_name in B_TOPIC_SUBDIRS:
+        mtime, names = _snapshot_topics_dir(os.path.join(b_agent_dir, subdir_name))
+        b_mtimes.append(mtime)
+        topic_ids_b.update(names)
+    
+    return {
+        'a_id': agent_a_id,
+        'a_mtime': a_mtime,
+        'b_mtimes': b_mtimes,
+        'topic_ids_a': sorted(topic_ids_a),
+        'topic_ids_b': sorted(topic_ids_b)
+    }
+
+
+def load_sync_state(filepath: str) -> Dict[str, Dict]:
+    """Load the saved sync state; an unreadable file means every pair is rescanned.
+    
+    Returns:
+        Dict with B agent IDs as keys, each an agent pair state
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            state = _json_loads(f.read())
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Warning: ignoring unreadable sync state {filepath}: {e}")
+        return {}
+    
+    return state if isinstance(state, dict) else {}
+
+
+def record_agent_pair_state(sync_state: Dict, agent_a_id: str, agent_b_id: str, data_a: Dict, data_b: Dict):
+    """Record an agent pair's post-sync state, if every topic directory is accounted for.
+    
+    Directories the scan didn't load (e.g. no history.json yet) would not change
+    the parent mtime when they are filled in later, so such pairs are not cached.
+    """
+    state = get_agent_pair_state(agent_a_id, agent_b_id)
+    
+    # After syncing, both sides hold every loaded topic plus their own invalid ones
+    topic_ids = set(data_a.get('topics', {})) | set(data_b.get('topics', {}))
+    known_a = topic_ids | set(data_a.get('invalid_topic_ids', []))
+    known_b = topic_ids | set(data_b.get('invalid_topic_ids', []))
+    
+    if set(state['topic_ids_a']) == known_a and set(state['topic_ids_b']) == known_b:
+        sync_state[agent_b_id] = state
+    else:
+        sync_state.pop(agent_b_id, None)
 
 
 # ========== MAIN ==========
@@ -517,29 +787,59 @@ def main():
     agent_mapping = load_agent_mapping(AGENT_MAPPING_FILE)
     print(f"Found {len(agent_mapping)} agent mappings")
     
-    # Scan both frontends
+    # Skip agent pairs whose topic directories are unchanged since the last sync
+    sync_state_file = os.path.join(os.path.dirname(AGENT_MAPPING_FILE), SYNC_STATE_FILENAME)
+    sync_state = load_sync_state(sync_state_file)
+    
+    changed_mapping = {
+        agent_b_id: mapping
+        for agent_b_id, mapping in agent_mapping.items()
+        if sync_state.get(agent_b_id) != get_agent_pair_state(mapping['a_id'], agent_b_id)
+    }
+    
+    unchanged_count = len(agent_mapping) - len(changed_mapping)
+    if unchanged_count:
+        print(f"Skipping {unchanged_count} unchanged agent pairs")
+    
+    # Scan both frontends concurrently; they touch disjoint directory trees
     print(f"\nScanning Frontend A: {FRONTEND_A_PATH}")
-    data_a_all = scan_frontend_a(FRONTEND_A_PATH, agent_mapping)
+    print(f"Scanning Frontend B: {FRONTEND_B_PATH}")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_a = executor.submit(scan_frontend_a, FRONTEND_A_PATH, changed_mapping)
+        future_b = executor.submit(scan_frontend_b, FRONTEND_B_PATH, changed_mapping)
+        data_a_all = future_a.result()
+        data_b_all = future_b.result()
     print(f"Found {len(data_a_all)} agents in A")
-    
-    print(f"\nScanning Frontend B: {FRONTEND_B_PATH}")
-    data_b_all = scan_frontend_b(FRONTEND_B_PATH, agent_mapping)
     print(f"Found {len(data_b_all)} agents in B")
     
-    # Perform synchronization for each mapped agent pair
-    for agent_b_id, mapping in agent_mapping.items():
+    # Build the work list once from the scan results
+    pairs = []
+    missing = []
+    for agent_b_id, mapping in changed_mapping.items():
         agent_a_id = mapping['a_id']
         agent_name = mapping.get('name', 'Unknown')
         
         if agent_a_id not in data_a_all:
-            print(f"\nWarning: Agent {agent_name} ({agent_a_id}) not found in Frontend A")
-            continue
-        
-        if agent_b_id not in data_b_all:
-            print(f"\nWarning: Agent {agent_name} ({agent_b_id}) not found in Frontend B")
-            continue
-        
+            missing.append(f"{agent_name} ({agent_a_id}, Frontend A)")
+        elif agent_b_id not in data_b_all:
+            missing.append(f"{agent_name} ({agent_b_id}, Frontend B)")
+        else:
+            pairs.append((agent_a_id, agent_b_id))
+    
+    if missing:
+        print(f"\nWarning: {len(missing)} mapped agents not found: {', '.join(missing)}")
+    
+    # Perform synchronization for each mapped agent pair.
+    # Pairs run one at a time: their progress output would interleave, and
+    # two pairs mapped to the same A agent share one config.json.
+    for agent_a_id, agent_b_id in pairs:
         sync_agents(agent_a_id, agent_b_id, data_a_all[agent_a_id], data_b_all[agent_b_id])
+        record_agent_pair_state(sync_state, agent_a_id, agent_b_id, data_a_all[agent_a_id], data_b_all[agent_b_id])
+    
+    try:
+        _write_json_atomic(sync_state_file, sync_state)
+    except Exception as e:
+        print(f"\nWarning: could not save sync state to {sync_state_file}: {e}")
     
     print(f"\n{'='*60}")
     print("Synchronization complete!")